@@ -0,0 +1,154 @@
+import time
+from typing import Optional
+
+from async_tab import AsyncTab
+from async_webdriverbidi import execute, subscribe, unsubscribe
+from protocol import EventHandler, set_socket_path
+
+
+class AsyncBrowser:
+    port: int
+
+    _TABS_TTL = 0.5
+
+    def __init__(self, port: int, socket_path: Optional[str] = None) -> None:
+        """
+        Initialize an AsyncBrowser instance.
+
+        Args:
+            port: The port number where the WebDriver BiDi server is running.
+            socket_path: The path of a Unix socket to reach the server through
+                instead of TCP, if it exposes one.
+        """
+        self.port = port
+        self._tabs_by_id: dict[str, AsyncTab] = {}
+        self._tabs_ts: float = 0
+        # For each getTree response in flight, the ids dropped since it was
+        # requested.
+        self._dropped_ids: list[set[str]] = []
+        self._handlers = self._event_handlers()
+        if socket_path:
+            set_socket_path(port, socket_path)
+        self._subscribed: Optional[bool] = None
+
+    async def get_tabs(self, ttl: float = _TABS_TTL) -> list[AsyncTab]:
+        """
+        Get the list of currently open tabs in the browser.
+
+        Args:
+            ttl: How many seconds a previously fetched list is reused for when
+                the browser could not be subscribed to context events.
+        Returns:
+            A list of AsyncTab objects representing the open tabs.
+        """
+        if self._subscribed is None:
+            self._subscribed = await subscribe(self.port, self._handlers)
+        # Once the list has been fetched, context events keep it up to date.
+        if self._subscribed and self._tabs_ts:
+            return list(self._tabs_by_id.values())
+        if time.monotonic() - self._tabs_ts < ttl:
+            return list(self._tabs_by_id.values())
+        # Events are handled on the same loop, so they can only change the
+        # tabs while the response is awaited.
+        # Events and other get_tabs() calls run on the same loop, so
+        # they can only change the tabs while the response is awaited.
+        known_ids = set(self._tabs_by_id)
+        self._dropped_ids.append(dropped_ids := set())
+        response = None
+        try:
+            response = await execute(
+                self.port, "browsingContext.getTree", {"maxDepth": 1}
+            )
+        finally:
+            if response:
+                self._merge_tabs(response["contexts"], known_ids, dropped_ids)
+                self._tabs_ts = time.monotonic()
+            self._dropped_ids = [
+                ids for ids in self._dropped_ids if ids is not dropped_ids
+            ]
+        return list(self._tabs_by_id.values()) if response else []
+
+    async def create_tab(self) -> Optional[AsyncTab]:
+        """
+        Create a new tab in the browser.
+
+        Returns:
+            An AsyncTab object representing the newly created tab, or None if creation failed.
+        """
+        if context := await execute(
+            self.port,
+            "browsingContext.create",
+            {"type": "tab"},
+        ):
+            # The contextCreated event may have registered the tab already.
+            if not (tab := self._tabs_by_id.get(context["context"])):
+                tab = self._tabs_by_id[context["context"]] = self._make_tab(
+                    context["context"], ""
+                )
+            return tab
+        return None
+
+    def invalidate_tabs(self) -> None:
+        """
+        Make the next get_tabs() call fetch the list of tabs again.
+        """
+        self._tabs_ts = 0
+
+    async def close(self) -> None:
+        """
+        Stop following the browser's context events.
+
+        The browser keeps answering get_tabs() by fetching the list of tabs
+        once the ttl has passed.
+        """
+        if self._subscribed:
+            self._subscribed = False
+            await unsubscribe(self.port, self._handlers)
+
+    def _merge_tabs(
+        self, contexts: list[dict], known_ids: set[str], dropped_ids: set[str]
+    ) -> None:
+        # Merge into the dict instead of replacing it, so that tabs created
+        # or dropped by events while the response was in flight are kept as
+        # the events left them.
+        listed_ids = set()
+        for context in contexts:
+            if (tab_id := context["context"]) in dropped_ids:
+                continue
+            listed_ids.add(tab_id)
+            if tab := self._tabs_by_id.get(tab_id):
+                tab.url = context["url"]
+            else:
+                self._tabs_by_id[tab_id] = self._make_tab(tab_id, context["url"])
+        for tab_id in known_ids - listed_ids:
+            self._tabs_by_id.pop(tab_id, None)
+
+    def _make_tab(self, tab_id: str, url: str) -> AsyncTab:
+        return AsyncTab(
+            port=self.port, id=tab_id, url=url, on_close=lambda: self._drop_tab(tab_id)
+        )
+
+    def _drop_tab(self, tab_id: str) -> None:
+        self._tabs_by_id.pop(tab_id, None)
+        for ids in self._dropped_ids:
+            ids.add(tab_id)
+
+    def _event_handlers(self) -> dict[str, EventHandler]:
+        return {
+            "browsingContext.contextCreated": self._on_context_created,
+            "browsingContext.contextDestroyed": self._on_context_destroyed,
+            "browsingContext.navigationStarted": self._on_navigation_started,
+        }
+
+    def _on_context_created(self, params: dict) -> None:
+        if params.get("parent") is None and params["context"] not in self._tabs_by_id:
+            self._tabs_by_id[params["context"]] = self._make_tab(
+                params["context"], params["url"]
+            )
+
+    def _on_context_destroyed(self, params: dict) -> None:
+        self._drop_tab(params["context"])
+
+    def _on_navigation_started(self, params: dict) -> None:
+        if tab := self._tabs_by_id.get(params["context"]):
+            tab.url = params["url"]
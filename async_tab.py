@@ -0,0 +1,370 @@
+import logging
+from collections import OrderedDict
+from typing import Callable, Optional
+
+from async_webdriverbidi import execute, execute_many, execute_oneway
+from scripts import (
+    GET_ELEMENT_ATTRIBUTE_IF_PRESENT_JS,
+    GET_ELEMENT_ATTRIBUTES_JS,
+    IS_ELEMENT_DISPLAYED_JS,
+    SET_ELEMENT_ATTRIBUTE_JS,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncTab:
+    port: int
+    id: str
+    url: str
+
+    _EVAL_CACHE_SIZE = 256
+
+    def __init__(
+        self,
+        port: int,
+        id: str,
+        url: str,
+        on_close: Optional[Callable[[], None]] = None,
+    ) -> None:
+        """
+        Initialize an AsyncTab instance.
+
+        Args:
+            port: The port number where the WebDriver BiDi server is running.
+            id: The unique identifier for the tab.
+            url: The current URL of the tab.
+            on_close: Called after the tab has been closed through close().
+        """
+        self.port = port
+        self.id = id
+        self.url = url
+        self._on_close = on_close
+        self._eval_cache: OrderedDict[tuple, dict] = OrderedDict()
+
+    def __str__(self) -> str:
+        return f"AsyncTab(port={self.port}, id={self.id}, url={self.url})"
+
+    async def navigate(self, url: str) -> bool:
+        """
+        Navigate the tab to a new URL.
+
+        Args:
+            url: The URL to navigate to.
+        Returns:
+            True if navigation was successful, False otherwise.
+        """
+        self._eval_cache.clear()
+        if result := await execute(
+            self.port,
+            "browsingContext.navigate",
+            {"url": url, "context": self.id, "wait": "complete"},
+        ):
+            self.url = result["url"]
+            return True
+        return False
+
+    async def reload(self) -> bool:
+        """
+        Reload this tab.
+
+        Returns:
+            True if reload was successful, False otherwise.
+        """
+        self._eval_cache.clear()
+        if response := await execute(
+            self.port,
+            "browsingContext.reload",
+            {
+                "context": self.id,
+                "wait": "complete",
+            },
+        ):
+            self.url = response["url"]
+            return True
+        return False
+
+    async def close(self) -> bool:
+        """
+        Close this tab.
+
+        The close command is not waited for, a failure to close is only logged.
+        on_close is called once the driver has confirmed the close.
+
+        Returns:
+            True once the tab has been asked to close.
+        """
+        return await execute_oneway(
+            self.port,
+            "browsingContext.close",
+            {"context": self.id},
+            on_result=self._closed,
+        )
+
+    def _closed(self, _result: dict) -> None:
+        if self._on_close:
+            self._on_close()
+
+    async def evaluate(self, script: str, cache: bool = False) -> Optional[dict]:
+        """
+        Evaluate a JavaScript expression in the context of this tab.
+
+        Args:
+            script: The JavaScript expression to evaluate.
+            cache: Whether to reuse the result of a previous evaluation of the
+                same script on the same URL. Only meant for read-only scripts,
+                results are dropped on navigation and after DOM changes made
+                through this tab.
+        Returns:
+            The result of the evaluation, or None if evaluation failed.
+        """
+        key = (self.id, self.url, script)
+        if cache and key in self._eval_cache:
+            self._eval_cache.move_to_end(key)
+            return self._eval_cache[key]
+        if response := await execute(
+            self.port,
+            "script.evaluate",
+            {
+                "expression": script,
+                "target": {"context": self.id},
+                "awaitPromise": True,
+            },
+        ):
+            logger.debug("Evaluated script: %s -> %s", script, response)
+            if (result := response.get("result")) and cache:
+                self._eval_cache[key] = result
+                if len(self._eval_cache) > self._EVAL_CACHE_SIZE:
+                    self._eval_cache.popitem(last=False)
+            return result or None
+        return None
+
+    async def batch(self, *calls: tuple[str, Optional[dict]]) -> list[Optional[dict]]:
+        """
+        Send several BiDi commands in one round trip.
+
+        Args:
+            calls: (method, params) pairs, e.g. ("script.evaluate", {...}).
+        Returns:
+            The result of each command in order, None for the ones that failed.
+        """
+        return await execute_many(self.port, list(calls))
+
+    async def has_element_attribute(
+        self, query: str, attribute: str, cache: bool = False
+    ) -> Optional[bool]:
+        """
+        Check if an element has a specific attribute.
+
+        Args:
+            query: The JavaScript query to select the element.
+            attribute: The name of the attribute to check.
+            cache: Whether to reuse a previous result, see evaluate().
+        Returns:
+            True if the attribute exists, False if not, None if evaluation failed.
+        """
+        if response := await self.evaluate(
+            f""" {query}.hasAttribute('{attribute}') """, cache
+        ):
+            if response["type"] != "null":
+                return response["value"]
+        return None
+
+    async def get_element_attribute(self, query: str, attribute: str) -> Optional[str]:
+        """
+        Get the value of an attribute for an element selected by the query.
+
+        Args:
+            query: The JavaScript query to select the element.
+            attribute: The name of the attribute to retrieve.
+        Returns:
+            The value of the attribute if found, None otherwise.
+        """
+        if response := await self.evaluate(f""" {query}.{attribute} """):
+            if response["type"] != "null":
+                return response["value"]
+        return None
+
+    async def get_element_attribute_if_present(
+        self, query: str, attribute: str
+    ) -> Optional[str]:
+        """
+        Get the value of an attribute for an element selected by the query, in
+        a single evaluation, if the element has that attribute.
+
+        Args:
+            query: The JavaScript query to select the element.
+            attribute: The name of the attribute to retrieve.
+        Returns:
+            The value of the attribute if present, None otherwise.
+        """
+        if response := await self.evaluate(
+            GET_ELEMENT_ATTRIBUTE_IF_PRESENT_JS.format(query=query, attribute=attribute)
+        ):
+            if response["type"] != "null":
+                return response["value"]
+        return None
+
+    async def get_element_attributes(
+        self, query: str, attributes: list[str]
+    ) -> Optional[dict[str, Optional[str]]]:
+        """
+        Get the values of several attributes for an element selected by the
+        query, in a single evaluation.
+
+        Args:
+            query: The JavaScript query to select the element.
+            attributes: The names of the attributes to retrieve.
+        Returns:
+            The value of each attribute, None for the ones not set, or None if
+            evaluation failed.
+        """
+        if response := await self.evaluate(
+            GET_ELEMENT_ATTRIBUTES_JS.format(
+                query=query,
+                attributes=", ".join(
+                    f"'{attribute}': element.{attribute}" for attribute in attributes
+                ),
+            )
+        ):
+            if response["type"] == "object":
+                return {
+                    attribute: value.get("value")
+                    for attribute, value in response["value"]
+                }
+        return None
+
+    async def set_element_attribute(
+        self, query: str, attribute: str, value: str
+    ) -> bool:
+        """
+        Set the value of an attribute for an element selected by the query.
+
+        Args:
+            query: The JavaScript query to select the element.
+            attribute: The name of the attribute to set.
+            value: The value to set for the attribute.
+        Returns:
+            True if the attribute was set successfully, False otherwise.
+        """
+        self._eval_cache.clear()
+        return (
+            await self.evaluate(
+                SET_ELEMENT_ATTRIBUTE_JS.format(
+                    query=query, attribute=attribute, value=value
+                )
+            )
+            is not None
+        )
+
+    async def remove_element_attribute(self, query: str, attribute: str) -> bool:
+        """
+        Remove an attribute from an element selected by the query.
+
+        Args:
+            query: The JavaScript query to select the element.
+            attribute: The name of the attribute to remove.
+        Returns:
+            True if the attribute was removed successfully, False otherwise.
+        """
+        self._eval_cache.clear()
+        return (
+            await self.evaluate(f""" {query}.removeAttribute('{attribute}') """)
+            is not None
+        )
+
+    async def is_element_found(self, query: str, cache: bool = False) -> Optional[bool]:
+        """
+        Check if an element exists in the DOM based on the provided query.
+
+        Args:
+            query: The JavaScript query to select the element.
+            cache: Whether to reuse a previous result, see evaluate().
+        Returns:
+            True if the element is found, False if not found, None if evaluation failed.
+        """
+        if result := await self.evaluate(query, cache):
+            return result["type"] != "null"
+        return None
+
+    async def is_element_displayed(self, query: str) -> Optional[bool]:
+        """
+        Check if an element is displayed in the viewport.
+
+        Args:
+            query: The JavaScript query to select the element.
+        Returns:
+            True if the element is displayed, False if not displayed, None if evaluation failed.
+        """
+        if response := await self.evaluate(IS_ELEMENT_DISPLAYED_JS.format(query=query)):
+            return response["value"]
+        return None
+
+    async def is_element_disabled(self, query: str) -> Optional[bool]:
+        """
+        Check if an element is disabled.
+
+        Args:
+            query: The JavaScript query to select the element.
+        Returns:
+            True if the element is disabled, False if not disabled, None if evaluation failed.
+        """
+        return await self.has_element_attribute(query, "disabled")
+
+    async def is_element_equal_to(
+        self, query1: str, query2: str, cache: bool = False
+    ) -> Optional[bool]:
+        """
+        Check if two elements are equal based on their queries.
+
+        Args:
+            query1: The JavaScript query for the first element.
+            query2: The JavaScript query for the second element.
+            cache: Whether to reuse a previous result, see evaluate().
+        Returns:
+            True if the elements are equal, False if not equal, None if evaluation failed.
+        """
+        if result := await self.evaluate(f""" {query1} === {query2} """, cache):
+            return result["value"]
+        return None
+
+    async def focus_element(self, query: str) -> bool:
+        """
+        Focus on an element selected by the query.
+
+        Args:
+            query: The JavaScript query to select the element.
+        Returns:
+            True if the element was focused successfully, False otherwise.
+        """
+        self._eval_cache.clear()
+        return await self.evaluate(f""" {query}.focus() """) is not None
+
+    async def click_element(self, query: str) -> bool:
+        """
+        Click on an element selected by the query.
+
+        Args:
+            query: The JavaScript query to select the element.
+        Returns:
+            True if the element was clicked successfully, False otherwise.
+        """
+        self._eval_cache.clear()
+        return await self.evaluate(f""" {query}.click() """) is not None
+
+    async def scroll_element(self, query: str) -> bool:
+        """
+        Scroll an element into view.
+
+        Args:
+            query: The JavaScript query to select the element.
+        Returns:
+            True if the element was scrolled into view successfully, False otherwise.
+        """
+        self._eval_cache.clear()
+        return (
+            await self.evaluate(
+                f""" {query}.scrollIntoView({{"block": "center", "inline": "nearest"}}) """
+            )
+            is not None
+        )
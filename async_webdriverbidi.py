@@ -0,0 +1,398 @@
+import asyncio
+import logging
+import socket
+import weakref
+from functools import partial
+from typing import Optional
+
+from websockets.asyncio import client
+from websockets.exceptions import ConnectionClosed
+
+from protocol import (
+    EventHandler,
+    ResultHandler,
+    dispatch_event,
+    encode_command,
+    finish_oneway,
+    get_socket_path,
+    parse_message,
+    read_result,
+)
+from webdriverbidi import SessionNotCreatedError
+
+logger = logging.getLogger(__name__)
+
+
+class Session:
+    def __init__(self, ws: client.ClientConnection, timeout: float = 30.0) -> None:
+        self.ws = ws
+        self.timeout = timeout
+        self.handlers: dict[str, list[EventHandler]] = {}
+        self._pending: dict[int, asyncio.Future] = {}
+        self._loop = asyncio.get_running_loop()
+        self._reader = asyncio.create_task(self._read_responses())
+
+    def is_usable(self) -> bool:
+        # The reader task dies with its event loop, e.g. at the end of an
+        # asyncio.run(), and nothing would resolve commands sent afterwards.
+        return self._loop is asyncio.get_running_loop() and not self._reader.done()
+
+    async def _read_responses(self) -> None:
+        # Responses are dispatched by id, so any number of coroutines can
+        # have commands in flight on the same connection.
+        try:
+            while True:
+                data = parse_message(await self.ws.recv(decode=False))
+                if data.get("type") == "event":
+                    dispatch_event(self.handlers, data)
+                    continue
+                response = self._pending.pop(data.get("id"), None)
+                if response and not response.done():
+                    response.set_result(data)
+        except ConnectionClosed:
+            pass
+        except asyncio.CancelledError:
+            # asyncio.run() cancels the reader as its loop finishes, the last
+            # chance to end the session: drivers allowing a single session
+            # would refuse the one the next loop starts otherwise.
+            await self._end_on_shutdown()
+            raise
+        finally:
+            while self._pending:
+                if not (response := self._pending.popitem()[1]).done():
+                    response.set_result({})
+
+    async def _end_on_shutdown(self) -> None:
+        # Nothing reads the response anymore, closing the connection after
+        # sending the command is all that can be done.
+        try:
+            await self.ws.send(encode_command("session.end", {})[1], text=True)
+        except ConnectionClosed:
+            pass
+        finally:
+            await self.ws.close()
+
+    def abort(self) -> None:
+        """
+        Shut the connection down without its event loop.
+
+        Used on sessions left over from a loop that is gone, whose connection
+        can't be closed with await anymore. The server ends the session once
+        it sees the connection drop.
+        """
+        if (transport := self.ws.transport).is_closing():
+            return
+        if sock := transport.get_extra_info("socket"):
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+    async def _send_command(
+        self,
+        method: str,
+        params: Optional[dict] = None,
+        timeout: Optional[float] = None,
+    ) -> Optional[dict]:
+        command_id, payload = encode_command(method, params)
+        response = asyncio.get_running_loop().create_future()
+        self._pending[command_id] = response
+        await self._send(command_id, payload)
+        try:
+            data = await asyncio.wait_for(
+                response, self.timeout if timeout is None else timeout
+            )
+        except TimeoutError:
+            self._pending.pop(command_id, None)
+            logger.warning("Timed out waiting for command %d", command_id)
+            data = {}
+        return read_result(data)
+
+    async def _send_commands(
+        self,
+        commands: list[tuple[str, Optional[dict]]],
+        timeout: Optional[float] = None,
+    ) -> list[Optional[dict]]:
+        # All commands are sent before any response is awaited, so the
+        # whole batch costs a single round trip.
+        loop = asyncio.get_running_loop()
+        responses = []
+        for method, params in commands:
+            command_id, payload = encode_command(method, params)
+            response = loop.create_future()
+            self._pending[command_id] = response
+            await self._send(command_id, payload)
+            responses.append((command_id, response))
+        deadline = loop.time() + (self.timeout if timeout is None else timeout)
+        results = []
+        for command_id, response in responses:
+            try:
+                data = await asyncio.wait_for(
+                    response, max(0.0, deadline - loop.time())
+                )
+            except TimeoutError:
+                self._pending.pop(command_id, None)
+                logger.warning("Timed out waiting for command %d", command_id)
+                data = {}
+            results.append(read_result(data))
+        return results
+
+    async def send_oneway(
+        self,
+        method: str,
+        params: Optional[dict] = None,
+        on_result: Optional[ResultHandler] = None,
+    ) -> bool:
+        command_id, payload = encode_command(method, params)
+        response = asyncio.get_running_loop().create_future()
+        response.add_done_callback(partial(finish_oneway, on_result))
+        self._pending[command_id] = response
+        await self._send(command_id, payload)
+        return True
+
+    async def _send(self, command_id: int, payload: bytes | str) -> None:
+        try:
+            await self.ws.send(payload, text=True)
+        except BaseException:
+            # Nothing will ever answer a command that was not sent.
+            self._pending.pop(command_id, None)
+            raise
+
+    async def _new(self) -> Optional[str]:
+        if response := await self(
+            "session.new",
+            {"capabilities": {}},
+        ):
+            return response["sessionId"]
+        return None
+
+    async def _end(self) -> bool:
+        return await self("session.end", {}) is not None
+
+    async def start(self) -> "Session":
+        """
+        Start the BiDi session on the connection.
+
+        Returns:
+            The session itself.
+        Raises:
+            SessionNotCreatedError: If the server did not start the session.
+        """
+        if not await self._new():
+            raise SessionNotCreatedError("The server did not start a BiDi session")
+        return self
+
+    async def __aenter__(self) -> "Session":
+        return await self.start()
+
+    async def __aexit__(self, exc_type, exc_value, traceback) -> None:
+        assert await self._end()
+
+    async def __call__(
+        self,
+        method: str,
+        params: Optional[dict] = None,
+        timeout: Optional[float] = None,
+    ) -> Optional[dict]:
+        return await self._send_command(method, params, timeout)
+
+    async def batch(
+        self,
+        commands: list[tuple[str, Optional[dict]]],
+        timeout: Optional[float] = None,
+    ) -> list[Optional[dict]]:
+        return await self._send_commands(commands, timeout)
+
+
+_connections: dict[int, tuple[client.ClientConnection, Session]] = {}
+_connections_locks: weakref.WeakKeyDictionary[
+    asyncio.AbstractEventLoop, asyncio.Lock
+] = weakref.WeakKeyDictionary()
+
+
+def _connections_lock() -> asyncio.Lock:
+    # A lock is bound to the loop it is first used in, so each loop gets one.
+    return _connections_locks.setdefault(asyncio.get_running_loop(), asyncio.Lock())
+
+
+async def _resubscribe(session: Session, stale: Session) -> None:
+    # The server forgets subscriptions along with the old session.
+    if stale.handlers:
+        session.handlers.update(stale.handlers)
+        await session("session.subscribe", {"events": list(stale.handlers)})
+
+
+async def get_session(port: int) -> Session:
+    """
+    Get the session for the given port, creating it on first use.
+
+    The connection and its BiDi session are shared by every command sent to
+    the port from the same event loop until close() is called. A session left
+    over from a finished loop or a dropped connection is replaced.
+
+    Args:
+        port: The port number where the WebDriver BiDi server is running.
+    Returns:
+        The Session for the port.
+    Raises:
+        SessionNotCreatedError: If the server did not start a session on the
+            new connection, which is closed again.
+    """
+    stale = None
+    async with _connections_lock():
+        if port in _connections and not _connections[port][1].is_usable():
+            stale = _connections.pop(port)[1]
+            stale.abort()
+        if port not in _connections:
+            uri = f"ws://localhost:{port}/session"
+            if socket_path := get_socket_path(port):
+                websocket = await client.unix_connect(socket_path, uri)
+            else:
+                websocket = await client.connect(uri)
+            session = Session(websocket)
+            try:
+                await session.start()
+            except BaseException:
+                # Closing the connection also ends the session's reader task.
+                await websocket.close()
+                raise
+            _connections[port] = (websocket, session)
+        session = _connections[port][1]
+    if stale:
+        await _resubscribe(session, stale)
+    return session
+
+
+async def _reconnect(port: int, stale: Session) -> Session:
+    async with _connections_lock():
+        dropped = port in _connections and _connections[port][1] is stale
+        if dropped:
+            await _connections.pop(port)[0].close()
+    session = await get_session(port)
+    if dropped:
+        await _resubscribe(session, stale)
+    return session
+
+
+async def close(port: int) -> None:
+    """
+    End the session and close the connection cached for the given port.
+
+    Args:
+        port: The port number where the WebDriver BiDi server is running.
+    """
+    if connection := _connections.pop(port, None):
+        websocket, session = connection
+        try:
+            await session.__aexit__(None, None, None)
+        finally:
+            await websocket.close()
+
+
+async def subscribe(port: int, handlers: dict[str, EventHandler]) -> bool:
+    """
+    Subscribe to BiDi events and call the given handlers when they arrive.
+
+    Handlers run on the connection's reader task and receive the event's
+    params, so they should return quickly.
+
+    Args:
+        port: The port number where the WebDriver BiDi server is running.
+        handlers: A handler for each event name to subscribe to.
+    Returns:
+        True if the subscription was successful, False otherwise.
+    """
+    session = await get_session(port)
+    for event, handler in handlers.items():
+        # Subscribing the same handler twice must not make it run twice.
+        if handler not in (registered := session.handlers.setdefault(event, [])):
+            registered.append(handler)
+    return await session("session.subscribe", {"events": list(handlers)}) is not None
+
+
+async def unsubscribe(port: int, handlers: dict[str, EventHandler]) -> None:
+    """
+    Stop calling handlers previously passed to subscribe().
+
+    Events left without any handler are unsubscribed from on the server.
+
+    Args:
+        port: The port number where the WebDriver BiDi server is running.
+        handlers: The handler for each event name to remove.
+    """
+    if not (connection := _connections.get(port)):
+        return
+    session = connection[1]
+    events = []
+    for event, handler in handlers.items():
+        registered = session.handlers.get(event, [])
+        if handler in registered:
+            registered.remove(handler)
+            if not registered:
+                del session.handlers[event]
+                events.append(event)
+    # A stale session is replaced, and resubscribed, on its next use anyway.
+    if events and session.is_usable():
+        await session("session.unsubscribe", {"events": events})
+
+
+async def execute(
+    port: int,
+    method: str,
+    params: Optional[dict] = None,
+    timeout: Optional[float] = None,
+) -> Optional[dict]:
+    session = await get_session(port)
+    try:
+        return await session(method, params, timeout)
+    except ConnectionClosed:
+        # Nothing was sent on the dropped connection, so trying once more on
+        # a fresh one is safe.
+        return await (await _reconnect(port, session))(method, params, timeout)
+
+
+async def execute_many(
+    port: int,
+    commands: list[tuple[str, Optional[dict]]],
+    timeout: Optional[float] = None,
+) -> list[Optional[dict]]:
+    session = await get_session(port)
+    try:
+        return await session.batch(commands, timeout)
+    except ConnectionClosed:
+        # Part of the batch may have run already, so it is not sent again,
+        # but the next commands must not go to the dropped connection.
+        logger.error("Connection closed while sending a batch of commands")
+        await _reconnect(port, session)
+        return [None] * len(commands)
+
+
+async def execute_oneway(
+    port: int,
+    method: str,
+    params: Optional[dict] = None,
+    on_result: Optional[ResultHandler] = None,
+) -> bool:
+    """
+    Send a command without waiting for its response.
+
+    A failure is only logged once the response arrives, so this is meant for
+    commands callers could not act on the failure of anyway.
+
+    Args:
+        port: The port number where the WebDriver BiDi server is running.
+        method: The BiDi method to call.
+        params: The parameters of the command.
+        on_result: Called on the connection's reader task with the result, if
+            the command succeeds.
+    Returns:
+        True once the command has been sent.
+    """
+    session = await get_session(port)
+    try:
+        return await session.send_oneway(method, params, on_result)
+    except ConnectionClosed:
+        # The command was not sent on the dropped connection, so sending it
+        # on a fresh one is safe.
+        session = await _reconnect(port, session)
+        return await session.send_oneway(method, params, on_result)
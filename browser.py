@@ -1,34 +1,71 @@
+import threading
+import time
 from typing import Optional
 
+from protocol import EventHandler, set_socket_path
 from tab import Tab
-from webdriverbidi import execute
+from webdriverbidi import execute, subscribe, unsubscribe
 
 
 class Browser:
     port: int
 
-    def __init__(self, port: int) -> None:
+    _TABS_TTL = 0.5
+
+    def __init__(self, port: int, socket_path: Optional[str] = None) -> None:
         """
         Initialize a Browser instance.
 
         Args:
             port: The port number where the WebDriver BiDi server is running.
+            socket_path: The path of a Unix socket to reach the server through
+                instead of TCP, if it exposes one.
         """
         self.port = port
+        self._tabs_by_id: dict[str, Tab] = {}
+        self._tabs_ts: float = 0
+        # Context events arrive on the connection's reader thread, so every
+        # change to the tabs is made under this lock.
+        self._tabs_lock = threading.Lock()
+        # For each getTree response in flight, the ids dropped since it was
+        # requested.
+        self._dropped_ids: list[set[str]] = []
+        if socket_path:
+            set_socket_path(port, socket_path)
+        self._handlers = self._event_handlers()
+        self._subscribed = subscribe(self.port, self._handlers)
 
-    def get_tabs(self) -> list[Tab]:
+    def get_tabs(self, ttl: float = _TABS_TTL) -> list[Tab]:
         """
         Get the list of currently open tabs in the browser.
 
+        Args:
+            ttl: How many seconds a previously fetched list is reused for when
+                the browser could not be subscribed to context events.
         Returns:
             A list of Tab objects representing the open tabs.
         """
-        if response := execute(self.port, "browsingContext.getTree", {"maxDepth": 1}):
-            return [
-                Tab(port=self.port, id=context["context"], url=context["url"])
-                for context in response["contexts"]
-            ]
-        return []
+        # Once the list has been fetched, context events keep it up to date.
+        with self._tabs_lock:
+            if (self._subscribed and self._tabs_ts) or (
+                time.monotonic() - self._tabs_ts < ttl
+            ):
+                return list(self._tabs_by_id.values())
+            known_ids = set(self._tabs_by_id)
+            self._dropped_ids.append(dropped_ids := set())
+        response = None
+        try:
+            response = execute(self.port, "browsingContext.getTree", {"maxDepth": 1})
+        finally:
+            with self._tabs_lock:
+                if response:
+                    self._merge_tabs(response["contexts"], known_ids, dropped_ids)
+                    self._tabs_ts = time.monotonic()
+                self._dropped_ids = [
+                    ids for ids in self._dropped_ids if ids is not dropped_ids
+                ]
+                tabs = list(self._tabs_by_id.values()) if response else []
+        return tabs
 
     def create_tab(self) -> Optional[Tab]:
         """
@@ -42,5 +79,81 @@ class Browser:
             "browsingContext.create",
             {"type": "tab"},
         ):
-            return Tab(port=self.port, id=context["context"], url="")
+            with self._tabs_lock:
+                # The contextCreated event may have registered the tab already.
+                if not (tab := self._tabs_by_id.get(context["context"])):
+                    tab = self._tabs_by_id[context["context"]] = self._make_tab(
+                        context["context"], ""
+                    )
+                return tab
         return None
+
+    def invalidate_tabs(self) -> None:
+        """
+        Make the next get_tabs() call fetch the list of tabs again.
+        """
+        self._tabs_ts = 0
+
+    def close(self) -> None:
+        """
+        Stop following the browser's context events.
+
+        The browser keeps answering get_tabs() by fetching the list of tabs
+        once the ttl has passed.
+        """
+        if self._subscribed:
+            self._subscribed = False
+            unsubscribe(self.port, self._handlers)
+
+    def _merge_tabs(
+        self, contexts: list[dict], known_ids: set[str], dropped_ids: set[str]
+    ) -> None:
+        # Merge into the dict instead of replacing it, so that tabs created
+        # or dropped by events while the response was in flight are kept as
+        # the events left them.
+        listed_ids = set()
+        for context in contexts:
+            if (tab_id := context["context"]) in dropped_ids:
+                continue
+            listed_ids.add(tab_id)
+            if tab := self._tabs_by_id.get(tab_id):
+                tab.url = context["url"]
+            else:
+                self._tabs_by_id[tab_id] = self._make_tab(tab_id, context["url"])
+        for tab_id in known_ids - listed_ids:
+            self._tabs_by_id.pop(tab_id, None)
+
+    def _make_tab(self, tab_id: str, url: str) -> Tab:
+        return Tab(
+            port=self.port, id=tab_id, url=url, on_close=lambda: self._drop_tab(tab_id)
+        )
+
+    def _drop_tab(self, tab_id: str) -> None:
+        with self._tabs_lock:
+            self._tabs_by_id.pop(tab_id, None)
+            for ids in self._dropped_ids:
+                ids.add(tab_id)
+
+    def _event_handlers(self) -> dict[str, EventHandler]:
+        return {
+            "browsingContext.contextCreated": self._on_context_created,
+            "browsingContext.contextDestroyed": self._on_context_destroyed,
+            "browsingContext.navigationStarted": self._on_navigation_started,
+        }
+
+    def _on_context_created(self, params: dict) -> None:
+        if params.get("parent") is not None:
+            return
+        with self._tabs_lock:
+            if params["context"] not in self._tabs_by_id:
+                self._tabs_by_id[params["context"]] = self._make_tab(
+                    params["context"], params["url"]
+                )
+
+    def _on_context_destroyed(self, params: dict) -> None:
+        self._drop_tab(params["context"])
+
+    def _on_navigation_started(self, params: dict) -> None:
+        with self._tabs_lock:
+            if tab := self._tabs_by_id.get(params["context"]):
+                tab.url = params["url"]
@@ -0,0 +1,194 @@
+import itertools
+import json
+import logging
+import re
+from concurrent.futures import Future
+from typing import Callable, Optional
+
+try:
+    import orjson
+
+    _dumps = orjson.dumps
+    _loads = orjson.loads
+    _dumps_bytes = orjson.dumps
+except ImportError:
+    _dumps = json.dumps
+    _loads = json.loads
+
+    def _dumps_bytes(obj) -> bytes:
+        return json.dumps(obj).encode()
+
+
+logger = logging.getLogger(__name__)
+
+_command_ids = itertools.count(1)
+
+
+def _make_command(method: str, params: Optional[dict] = None) -> dict:
+    return {
+        "id": next(_command_ids),
+        "method": method,
+        "params": params or {},
+    }
+
+
+# Envelopes of the commands whose shape never changes, keyed by method along
+# with the params they take; only the id and the param values are filled in.
+_ENVELOPES: dict[str, tuple[tuple[str, ...], bytes]] = {
+    "browsingContext.close": (
+        ("context",),
+        b'{"id":%d,"method":"browsingContext.close","params":{"context":%b}}',
+    ),
+    "browsingContext.reload": (
+        ("context", "wait"),
+        b'{"id":%d,"method":"browsingContext.reload",'
+        b'"params":{"context":%b,"wait":%b}}',
+    ),
+    "browsingContext.navigate": (
+        ("url", "context", "wait"),
+        b'{"id":%d,"method":"browsingContext.navigate",'
+        b'"params":{"url":%b,"context":%b,"wait":%b}}',
+    ),
+    "browsingContext.getTree": (
+        ("maxDepth",),
+        b'{"id":%d,"method":"browsingContext.getTree","params":{"maxDepth":%b}}',
+    ),
+    "browsingContext.create": (
+        ("type",),
+        b'{"id":%d,"method":"browsingContext.create","params":{"type":%b}}',
+    ),
+}
+
+
+_TEMPLATES: dict[str, tuple[tuple[str, ...], frozenset[str], bytes]] = {
+    method: (keys, frozenset(keys), envelope)
+    for method, (keys, envelope) in _ENVELOPES.items()
+}
+
+
+def encode_command(
+    method: str, params: Optional[dict] = None
+) -> tuple[int, bytes | str]:
+    # orjson encodes a whole command faster than the values can be encoded
+    # one by one, so the envelopes only pay off with the json module.
+    if _dumps is json.dumps and (template := _TEMPLATES.get(method)) and params:
+        keys, key_set, envelope = template
+        if params.keys() == key_set:
+            command_id = next(_command_ids)
+            values = tuple(_dumps_bytes(params[key]) for key in keys)
+            return command_id, envelope % (command_id, *values)
+    command = _make_command(method, params)
+    return command["id"], _dumps(command)
+
+
+# A script.evaluate response whose result is a boolean, number, null or
+# undefined, as laid out by Firefox and by Chromium. It is only trusted on
+# frames with exactly the three objects and the keys of that shape: any string
+# containing a brace or a quote would add to the counts, so the patterns below
+# can't be matching text inside a string and there is nothing else in the
+# frame to lose.
+_REMOTE_PRIMITIVE = (
+    rb'"result":\{"type":"(?P<type>boolean|number|null|undefined)"'
+    rb'(?:,"value":(?P<value>true|false|-?\d+(?:\.\d+)?(?:[eE][+-]?\d+)?))?\}'
+)
+_REALM = rb'"realm":"(?P<realm>[^"\\]*)"'
+_PRIMITIVE_RESULT_RES = (
+    re.compile(rb'"result":\{"type":"success",' + _REMOTE_PRIMITIVE + b"," + _REALM),
+    re.compile(
+        rb'"result":\{' + _REALM + b"," + _REMOTE_PRIMITIVE + b',"type":"success"'
+    ),
+)
+_ID_RE = re.compile(rb'"id":(\d+)')
+
+
+def parse_message(message: bytes) -> dict:
+    # orjson parses these frames faster than the patterns can match them, so
+    # the shortcut only pays off when falling back to the json module.
+    if _loads is not json.loads:
+        return _loads(message)
+    if (
+        message.count(b"{") == 3
+        and b'"type":"e' not in message  # error, event or exception
+        and (
+            result := _PRIMITIVE_RESULT_RES[0].search(message)
+            or _PRIMITIVE_RESULT_RES[1].search(message)
+        )
+        and (command_id := _ID_RE.search(message))
+        # id, type, result; type, result, realm; type and maybe value.
+        and message.count(b'":') == (7 if result["value"] is None else 8)
+    ):
+        remote_value = {"type": result["type"].decode()}
+        if (value := result["value"]) in (b"true", b"false"):
+            remote_value["value"] = value == b"true"
+        elif value is not None:
+            is_int = value.lstrip(b"-").isdigit()
+            remote_value["value"] = int(value) if is_int else float(value)
+        return {
+            "id": int(command_id.group(1)),
+            "type": "success",
+            "result": {
+                "type": "success",
+                "result": remote_value,
+                "realm": result["realm"].decode(),
+            },
+        }
+    return _loads(message)
+
+
+def read_result(data: dict) -> Optional[dict]:
+    if data.get("type") == "success":
+        return data["result"]
+    if data.get("type") == "error":
+        if logger.isEnabledFor(logging.ERROR):
+            logger.error("Error: %s, Message: %s", data["error"], data["message"])
+    return None
+
+
+EventHandler = Callable[[dict], None]
+
+
+def dispatch_event(handlers: dict[str, list[EventHandler]], data: dict) -> None:
+    # Iterate over a copy, a handler may unsubscribe while events are dispatched.
+    for handler in tuple(handlers.get(data["method"], ())):
+        try:
+            handler(data["params"])
+        except Exception:  # pylint: disable=broad-exception-caught
+            # A faulty handler must not take the connection's reader down.
+            logger.exception("Error handling event %s", data["method"])
+
+
+ResultHandler = Callable[[dict], None]
+
+
+def finish_oneway(on_result: Optional[ResultHandler], future: Future) -> None:
+    # Nobody waits on one-way commands, so failures can only be logged.
+    if exc := future.exception():
+        logger.error("Error sending command: %s", exc)
+    elif (result := read_result(future.result())) is not None and on_result:
+        on_result(result)
+
+
+_socket_paths: dict[int, str] = {}
+
+
+def set_socket_path(port: int, socket_path: str) -> None:
+    """
+    Connect to the BiDi server of the given port through a Unix domain socket.
+
+    Args:
+        port: The port number the BiDi server is known by.
+        socket_path: The path of the Unix socket the server is listening on.
+    """
+    _socket_paths[port] = socket_path
+
+
+def get_socket_path(port: int) -> Optional[str]:
+    """
+    Get the Unix socket set for the given port, if any.
+
+    Args:
+        port: The port number the BiDi server is known by.
+    Returns:
+        The path of the Unix socket, or None to connect through TCP.
+    """
+    return _socket_paths.get(port)
@@ -0,0 +1,39 @@
+# Scripts that only vary by the element query and attribute are joined once
+# here, each call then only substitutes its arguments.
+# Setting an attribute is a single function expression applied to the element
+# and the value, so its compilation can be cached by the browser when loops
+# set the same attribute over and over.
+SET_ELEMENT_ATTRIBUTE_JS = "".join(
+    [
+        "(function (element, value) {{",
+        " element.{attribute} = value;",
+        " element.dispatchEvent(new Event('input'));",
+        " element.dispatchEvent(new Event('change'));",
+        " return true;",
+        " }})({query}, '{value}')",
+    ]
+)
+GET_ELEMENT_ATTRIBUTE_IF_PRESENT_JS = "".join(
+    [
+        "(function (element) {{",
+        " return element.hasAttribute('{attribute}') ? element.{attribute} : null;",
+        " }})({query})",
+    ]
+)
+GET_ELEMENT_ATTRIBUTES_JS = (
+    "(function (element) {{ return {{ {attributes} }}; }})({query})"
+)
+IS_ELEMENT_DISPLAYED_JS = ";".join(
+    [
+        """ var element = {query} """,
+        """ var rect = element.getBoundingClientRect() """,
+        "&&".join(
+            [
+                "rect.top >= 0",
+                "rect.left >= 0",
+                "rect.bottom <= (window.innerHeight || document.documentElement.clientHeight)",
+                "rect.right <= (window.innerWidth || document.documentElement.clientWidth)",
+            ]
+        ),
+    ]
+)
@@ -1,6 +1,16 @@
-from typing import Optional
+import logging
+from collections import OrderedDict
+from typing import Callable, Optional
 
-from webdriverbidi import execute
+from scripts import (
+    GET_ELEMENT_ATTRIBUTE_IF_PRESENT_JS,
+    GET_ELEMENT_ATTRIBUTES_JS,
+    IS_ELEMENT_DISPLAYED_JS,
+    SET_ELEMENT_ATTRIBUTE_JS,
+)
+from webdriverbidi import execute, execute_many, execute_oneway
+
+logger = logging.getLogger(__name__)
 
 
 class Tab:
@@ -8,7 +18,15 @@ class Tab:
     id: str
     url: str
 
-    def __init__(self, port: int, id: str, url: str) -> None:
+    _EVAL_CACHE_SIZE = 256
+
+    def __init__(
+        self,
+        port: int,
+        id: str,
+        url: str,
+        on_close: Optional[Callable[[], None]] = None,
+    ) -> None:
         """
         Initialize a Tab instance.
 
@@ -16,10 +34,13 @@ class Tab:
             port: The port number where the WebDriver BiDi server is running.
             id: The unique identifier for the tab.
             url: The current URL of the tab.
+            on_close: Called after the tab has been closed through close().
         """
         self.port = port
         self.id = id
         self.url = url
+        self._on_close = on_close
+        self._eval_cache: OrderedDict[tuple, dict] = OrderedDict()
 
     def __str__(self) -> str:
         return f"Tab(port={self.port}, id={self.id}, url={self.url})"
@@ -33,6 +54,7 @@ class Tab:
         Returns:
             True if navigation was successful, False otherwise.
         """
+        self._eval_cache.clear()
         if result := execute(
             self.port,
             "browsingContext.navigate",
@@ -49,6 +71,7 @@ class Tab:
         Returns:
             True if reload was successful, False otherwise.
         """
+        self._eval_cache.clear()
         if response := execute(
             self.port,
             "browsingContext.reload",
@@ -65,23 +88,40 @@ class Tab:
         """
         Close this tab.
 
+        The close command is not waited for, a failure to close is only logged.
+        on_close is called once the driver has confirmed the close.
+
         Returns:
-            True if the tab was closed successfully, False otherwise.
+            True once the tab has been asked to close.
         """
-        return (
-            execute(self.port, "browsingContext.close", {"context": self.id})
-            is not None
+        return execute_oneway(
+            self.port,
+            "browsingContext.close",
+            {"context": self.id},
+            on_result=self._closed,
         )
 
-    def evaluate(self, script: str) -> Optional[dict]:
+    def _closed(self, _result: dict) -> None:
+        if self._on_close:
+            self._on_close()
+
+    def evaluate(self, script: str, cache: bool = False) -> Optional[dict]:
         """
         Evaluate a JavaScript expression in the context of this tab.
 
         Args:
             script: The JavaScript expression to evaluate.
+            cache: Whether to reuse the result of a previous evaluation of the
+                same script on the same URL. Only meant for read-only scripts,
+                results are dropped on navigation and after DOM changes made
+                through this tab.
         Returns:
             The result of the evaluation, or None if evaluation failed.
         """
+        key = (self.id, self.url, script)
+        if cache and key in self._eval_cache:
+            self._eval_cache.move_to_end(key)
+            return self._eval_cache[key]
         if response := execute(
             self.port,
             "script.evaluate",
@@ -91,21 +131,41 @@ class Tab:
                 "awaitPromise": True,
             },
         ):
-            print(f"Evaluated script: {script} -> {response}")
-            return response.get("result") or None
+            logger.debug("Evaluated script: %s -> %s", script, response)
+            if (result := response.get("result")) and cache:
+                self._eval_cache[key] = result
+                if len(self._eval_cache) > self._EVAL_CACHE_SIZE:
+                    self._eval_cache.popitem(last=False)
+            return result or None
         return None
 
-    def has_element_attribute(self, query: str, attribute: str) -> Optional[bool]:
+    def batch(self, *calls: tuple[str, Optional[dict]]) -> list[Optional[dict]]:
+        """
+        Send several BiDi commands in one round trip.
+
+        Args:
+            calls: (method, params) pairs, e.g. ("script.evaluate", {...}).
+        Returns:
+            The result of each command in order, None for the ones that failed.
+        """
+        return execute_many(self.port, list(calls))
+
+    def has_element_attribute(
+        self, query: str, attribute: str, cache: bool = False
+    ) -> Optional[bool]:
         """
         Check if an element has a specific attribute.
 
         Args:
             query: The JavaScript query to select the element.
             attribute: The name of the attribute to check.
+            cache: Whether to reuse a previous result, see evaluate().
         Returns:
             True if the attribute exists, False if not, None if evaluation failed.
         """
-        if response := self.evaluate(f""" {query}.hasAttribute('{attribute}') """):
+        if response := self.evaluate(
+            f""" {query}.hasAttribute('{attribute}') """, cache
+        ):
             if response["type"] != "null":
                 return response["value"]
         return None
@@ -125,6 +185,55 @@ class Tab:
                 return response["value"]
         return None
 
+    def get_element_attribute_if_present(
+        self, query: str, attribute: str
+    ) -> Optional[str]:
+        """
+        Get the value of an attribute for an element selected by the query, in
+        a single evaluation, if the element has that attribute.
+
+        Args:
+            query: The JavaScript query to select the element.
+            attribute: The name of the attribute to retrieve.
+        Returns:
+            The value of the attribute if present, None otherwise.
+        """
+        if response := self.evaluate(
+            GET_ELEMENT_ATTRIBUTE_IF_PRESENT_JS.format(query=query, attribute=attribute)
+        ):
+            if response["type"] != "null":
+                return response["value"]
+        return None
+
+    def get_element_attributes(
+        self, query: str, attributes: list[str]
+    ) -> Optional[dict[str, Optional[str]]]:
+        """
+        Get the values of several attributes for an element selected by the
+        query, in a single evaluation.
+
+        Args:
+            query: The JavaScript query to select the element.
+            attributes: The names of the attributes to retrieve.
+        Returns:
+            The value of each attribute, None for the ones not set, or None if
+            evaluation failed.
+        """
+        if response := self.evaluate(
+            GET_ELEMENT_ATTRIBUTES_JS.format(
+                query=query,
+                attributes=", ".join(
+                    f"'{attribute}': element.{attribute}" for attribute in attributes
+                ),
+            )
+        ):
+            if response["type"] == "object":
+                return {
+                    attribute: value.get("value")
+                    for attribute, value in response["value"]
+                }
+        return None
+
     def set_element_attribute(self, query: str, attribute: str, value: str) -> bool:
         """
         Set the value of an attribute for an element selected by the query.
@@ -136,16 +245,12 @@ class Tab:
         Returns:
             True if the attribute was set successfully, False otherwise.
         """
+        self._eval_cache.clear()
         return (
             self.evaluate(
-                ";".join(
-                    [
-                        f""" var element = {query} """,
-                        f""" element.{attribute} = '{value}' """,
-                        """ element.dispatchEvent(new Event('input')) """,
-                        """ element.dispatchEvent(new Event('change')) """,
-                    ]
-                ),
+                SET_ELEMENT_ATTRIBUTE_JS.format(
+                    query=query, attribute=attribute, value=value
+                )
             )
             is not None
         )
@@ -160,20 +265,22 @@ class Tab:
         Returns:
             True if the attribute was removed successfully, False otherwise.
         """
+        self._eval_cache.clear()
         return (
             self.evaluate(f""" {query}.removeAttribute('{attribute}') """) is not None
         )
 
-    def is_element_found(self, query: str) -> Optional[bool]:
+    def is_element_found(self, query: str, cache: bool = False) -> Optional[bool]:
         """
         Check if an element exists in the DOM based on the provided query.
 
         Args:
             query: The JavaScript query to select the element.
+            cache: Whether to reuse a previous result, see evaluate().
         Returns:
             True if the element is found, False if not found, None if evaluation failed.
         """
-        if result := self.evaluate(query):
+        if result := self.evaluate(query, cache):
             return result["type"] != "null"
         return None
 
@@ -186,22 +293,7 @@ class Tab:
         Returns:
             True if the element is displayed, False if not displayed, None if evaluation failed.
         """
-        if response := self.evaluate(
-            ";".join(
-                [
-                    f""" var element = {query} """,
-                    """ var rect = element.getBoundingClientRect() """,
-                    "&&".join(
-                        [
-                            "rect.top >= 0",
-                            "rect.left >= 0",
-                            "rect.bottom <= (window.innerHeight || document.documentElement.clientHeight)",
-                            "rect.right <= (window.innerWidth || document.documentElement.clientWidth)",
-                        ]
-                    ),
-                ]
-            ),
-        ):
+        if response := self.evaluate(IS_ELEMENT_DISPLAYED_JS.format(query=query)):
             return response["value"]
         return None
 
@@ -216,17 +308,20 @@ class Tab:
         """
         return self.has_element_attribute(query, "disabled")
 
-    def is_element_equal_to(self, query1: str, query2: str) -> Optional[bool]:
+    def is_element_equal_to(
+        self, query1: str, query2: str, cache: bool = False
+    ) -> Optional[bool]:
         """
         Check if two elements are equal based on their queries.
 
         Args:
             query1: The JavaScript query for the first element.
             query2: The JavaScript query for the second element.
+            cache: Whether to reuse a previous result, see evaluate().
         Returns:
             True if the elements are equal, False if not equal, None if evaluation failed.
         """
-        if result := self.evaluate(f""" {query1} === {query2} """):
+        if result := self.evaluate(f""" {query1} === {query2} """, cache):
             return result["value"]
         return None
 
@@ -239,6 +334,7 @@ class Tab:
         Returns:
             True if the element was focused successfully, False otherwise.
         """
+        self._eval_cache.clear()
         return self.evaluate(f""" {query}.focus() """) is not None
 
     def click_element(self, query: str) -> bool:
@@ -250,6 +346,7 @@ class Tab:
         Returns:
             True if the element was clicked successfully, False otherwise.
         """
+        self._eval_cache.clear()
         return self.evaluate(f""" {query}.click() """) is not None
 
     def scroll_element(self, query: str) -> bool:
@@ -261,6 +358,7 @@ class Tab:
         Returns:
             True if the element was scrolled into view successfully, False otherwise.
         """
+        self._eval_cache.clear()
         return (
             self.evaluate(
                 f""" {query}.scrollIntoView({{"block": "center", "inline": "nearest"}}) """
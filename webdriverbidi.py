@@ -1,38 +1,149 @@
-import json
+import atexit
 import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from functools import partial
 from typing import Optional
 
+from websockets.exceptions import ConnectionClosed
 from websockets.sync import client
 
+from protocol import (
+    EventHandler,
+    ResultHandler,
+    dispatch_event,
+    encode_command,
+    finish_oneway,
+    get_socket_path,
+    parse_message,
+    read_result,
+)
 
-def _make_command(method: str, params: Optional[dict] = None) -> dict:
-    return {
-        "id": 1,
-        "method": method,
-        "params": params or {},
-    }
+logger = logging.getLogger(__name__)
 
 
-def _send_command(
-    ws: client.ClientConnection, method: str, params: Optional[dict] = None
-) -> Optional[dict]:
-    ws.send(json.dumps(_make_command(method, params)))
-    if response := ws.recv():
-        data = json.loads(response)
-        if data.get("type") == "success":
-            return data["result"]
-        if data.get("type") == "error":
-            logging.error(f"Error: {data['error']}, Message: {data['message']}")
-    return None
+class SessionNotCreatedError(ConnectionError):
+    """
+    Raised when the BiDi server does not start a session on a new connection.
+    """
+
+
+class ConnectionWorker:
+    """
+    Owns the I/O of a connection: a writer thread sends queued commands and a
+    reader thread resolves their futures by id, so callers never touch the
+    socket themselves and threads sharing a connection don't contend on it.
+    """
+
+    def __init__(
+        self, ws: client.ClientConnection, handlers: dict[str, list[EventHandler]]
+    ) -> None:
+        self.ws = ws
+        self.handlers = handlers
+        self._pending: dict[int, Future] = {}
+        self._dropped = False
+        self._outgoing: queue.Queue[Optional[tuple[int, bytes | str]]] = queue.Queue()
+        self._writer = threading.Thread(target=self._write_commands, daemon=True)
+        self._reader = threading.Thread(target=self._read_responses, daemon=True)
+        self._writer.start()
+        self._reader.start()
+
+    def _write_commands(self) -> None:
+        while command := self._outgoing.get():
+            command_id, payload = command
+            try:
+                self.ws.send(payload, text=True)
+            except ConnectionClosed as exc:
+                # The reader may not have noticed yet, but no command must be
+                # handed to this connection anymore: one-way commands are
+                # not waited on, so nothing else would report the drop.
+                self._dropped = True
+                if future := self._pending.pop(command_id, None):
+                    future.set_exception(exc)
+
+    def _read_responses(self) -> None:
+        try:
+            while True:
+                data = parse_message(self.ws.recv(decode=False))
+                if data.get("type") == "event":
+                    dispatch_event(self.handlers, data)
+                elif future := self._pending.pop(data.get("id"), None):
+                    future.set_result(data)
+        except ConnectionClosed:
+            pass
+        finally:
+            while self._pending:
+                self._pending.popitem()[1].set_result({})
+
+    def submit(self, command_id: int, payload: bytes | str) -> Future:
+        future: Future = Future()
+        self._pending[command_id] = future
+        self._outgoing.put((command_id, payload))
+        return future
+
+    def forget(self, command_id: int) -> None:
+        self._pending.pop(command_id, None)
+
+    def is_alive(self) -> bool:
+        # The reader only stops once the connection is closed.
+        return not self._dropped and self._reader.is_alive()
+
+    def close(self) -> None:
+        self._outgoing.put(None)
+        self.ws.close()
 
 
 class Session:
-    def __init__(self, ws: client.ClientConnection) -> None:
+    def __init__(self, ws: client.ClientConnection, timeout: float = 30.0) -> None:
         self.ws = ws
+        self.timeout = timeout
+        self.handlers: dict[str, list[EventHandler]] = {}
+        self.worker = ConnectionWorker(ws, self.handlers)
+
+    def _send_commands(
+        self,
+        commands: list[tuple[str, Optional[dict]]],
+        timeout: Optional[float] = None,
+    ) -> list[Optional[dict]]:
+        # All commands are queued before any response is awaited, so the
+        # whole batch costs a single round trip.
+        futures = [
+            (command_id, self.worker.submit(command_id, payload))
+            for command_id, payload in (
+                encode_command(method, params) for method, params in commands
+            )
+        ]
+        deadline = time.monotonic() + (self.timeout if timeout is None else timeout)
+        results = []
+        for command_id, future in futures:
+            try:
+                data = future.result(timeout=max(0.0, deadline - time.monotonic()))
+            except TimeoutError:
+                self.worker.forget(command_id)
+                logger.warning("Timed out waiting for command %d", command_id)
+                data = {}
+            results.append(read_result(data))
+        return results
+
+    def send_oneway(
+        self,
+        method: str,
+        params: Optional[dict] = None,
+        on_result: Optional[ResultHandler] = None,
+    ) -> bool:
+        command_id, payload = encode_command(method, params)
+        future = self.worker.submit(command_id, payload)
+        future.add_done_callback(partial(finish_oneway, on_result))
+        return True
+
+    def is_usable(self) -> bool:
+        # Nothing would resolve commands sent on a dropped connection.
+        return self.worker.is_alive()
 
     def _new(self) -> Optional[str]:
-        if response := _send_command(
-            self.ws,
+        if response := self(
             "session.new",
             {"capabilities": {}},
         ):
@@ -40,21 +151,228 @@ class Session:
         return None
 
     def _end(self) -> bool:
-        return _send_command(self.ws, "session.end", {}) is not None
+        return self("session.end", {}) is not None
 
-    def __enter__(self) -> "Session":
-        assert self._new()
+    def start(self) -> "Session":
+        """
+        Start the BiDi session on the connection.
+
+        Returns:
+            The session itself.
+        Raises:
+            SessionNotCreatedError: If the server did not start the session.
+        """
+        if not self._new():
+            raise SessionNotCreatedError("The server did not start a BiDi session")
         return self
 
+    def __enter__(self) -> "Session":
+        return self.start()
+
     def __exit__(self, exc_type, exc_value, traceback) -> None:
         assert self._end()
 
-    def __call__(self, method: str, params: Optional[dict] = None) -> Optional[dict]:
-        return _send_command(self.ws, method, params)
+    def __call__(
+        self,
+        method: str,
+        params: Optional[dict] = None,
+        timeout: Optional[float] = None,
+    ) -> Optional[dict]:
+        return self._send_commands([(method, params)], timeout)[0]
+
+    def batch(
+        self,
+        commands: list[tuple[str, Optional[dict]]],
+        timeout: Optional[float] = None,
+    ) -> list[Optional[dict]]:
+        return self._send_commands(commands, timeout)
+
+
+_connections: dict[int, tuple[client.ClientConnection, Session]] = {}
+_connections_lock = threading.Lock()
+
+
+def _resubscribe(session: Session, stale: Session) -> None:
+    # The server forgets subscriptions along with the old session.
+    if stale.handlers:
+        session.handlers.update(stale.handlers)
+        session("session.subscribe", {"events": list(stale.handlers)})
+
+
+def get_session(port: int) -> Session:
+    """
+    Get the session for the given port, creating it on first use.
+
+    The connection and its BiDi session are shared by every command sent to
+    the port until close() is called or the process exits. A session whose
+    connection has dropped is replaced.
+
+    Args:
+        port: The port number where the WebDriver BiDi server is running.
+    Returns:
+        The Session for the port.
+    Raises:
+        SessionNotCreatedError: If the server did not start a session on the
+            new connection, which is closed again.
+    """
+    stale = None
+    with _connections_lock:
+        if port in _connections and not _connections[port][1].is_usable():
+            stale = _connections.pop(port)[1]
+            stale.worker.close()
+        if port not in _connections:
+            uri = f"ws://localhost:{port}/session"
+            if socket_path := get_socket_path(port):
+                websocket = client.unix_connect(socket_path, uri)
+            else:
+                websocket = client.connect(uri)
+            session = Session(websocket)
+            try:
+                session.start()
+            except BaseException:
+                # Nothing else holds the connection, stop its threads too.
+                session.worker.close()
+                raise
+            _connections[port] = (websocket, session)
+        session = _connections[port][1]
+    if stale:
+        _resubscribe(session, stale)
+    return session
+
+
+def _reconnect(port: int, stale: Session) -> Session:
+    with _connections_lock:
+        dropped = port in _connections and _connections[port][1] is stale
+        if dropped:
+            _connections.pop(port)[1].worker.close()
+    session = get_session(port)
+    if dropped:
+        _resubscribe(session, stale)
+    return session
+
+
+def close(port: int) -> None:
+    """
+    End the session and close the connection cached for the given port.
+
+    Args:
+        port: The port number where the WebDriver BiDi server is running.
+    """
+    if connection := _connections.pop(port, None):
+        session = connection[1]
+        try:
+            session.__exit__(None, None, None)
+        finally:
+            session.worker.close()
+
+
+@atexit.register
+def _close_all() -> None:
+    for port in list(_connections):
+        try:
+            close(port)
+        except (AssertionError, ConnectionClosed):
+            pass
+
+
+def subscribe(port: int, handlers: dict[str, EventHandler]) -> bool:
+    """
+    Subscribe to BiDi events and call the given handlers when they arrive.
+
+    Handlers run on the connection's reader thread and receive the event's
+    params, so they should return quickly.
+
+    Args:
+        port: The port number where the WebDriver BiDi server is running.
+        handlers: A handler for each event name to subscribe to.
+    Returns:
+        True if the subscription was successful, False otherwise.
+    """
+    session = get_session(port)
+    for event, handler in handlers.items():
+        # Subscribing the same handler twice must not make it run twice.
+        if handler not in (registered := session.handlers.setdefault(event, [])):
+            registered.append(handler)
+    return session("session.subscribe", {"events": list(handlers)}) is not None
+
+
+def unsubscribe(port: int, handlers: dict[str, EventHandler]) -> None:
+    """
+    Stop calling handlers previously passed to subscribe().
+
+    Events left without any handler are unsubscribed from on the server.
+
+    Args:
+        port: The port number where the WebDriver BiDi server is running.
+        handlers: The handler for each event name to remove.
+    """
+    if not (connection := _connections.get(port)):
+        return
+    session = connection[1]
+    events = []
+    for event, handler in handlers.items():
+        registered = session.handlers.get(event, [])
+        if handler in registered:
+            registered.remove(handler)
+            if not registered:
+                del session.handlers[event]
+                events.append(event)
+    if events:
+        session("session.unsubscribe", {"events": events})
+
+
+def execute(
+    port: int,
+    method: str,
+    params: Optional[dict] = None,
+    timeout: Optional[float] = None,
+) -> Optional[dict]:
+    session = get_session(port)
+    try:
+        return session(method, params, timeout)
+    except ConnectionClosed:
+        # Nothing was sent on the dropped connection, so trying once more on
+        # a fresh one is safe.
+        return _reconnect(port, session)(method, params, timeout)
+
+
+def execute_many(
+    port: int,
+    commands: list[tuple[str, Optional[dict]]],
+    timeout: Optional[float] = None,
+) -> list[Optional[dict]]:
+    session = get_session(port)
+    try:
+        return session.batch(commands, timeout)
+    except ConnectionClosed:
+        # Part of the batch may have run already, so it is not sent again,
+        # but the next commands must not go to the dropped connection.
+        logger.error("Connection closed while sending a batch of commands")
+        _reconnect(port, session)
+        return [None] * len(commands)
+
+
+def execute_oneway(
+    port: int,
+    method: str,
+    params: Optional[dict] = None,
+    on_result: Optional[ResultHandler] = None,
+) -> bool:
+    """
+    Send a command without waiting for its response.
 
+    A failure is only logged once the response arrives, so this is meant for
+    commands callers could not act on the failure of anyway. If the
+    connection has dropped, the command is lost, and the next command goes
+    to a new session.
 
-def execute(port: int, method: str, params: Optional[dict] = None) -> Optional[dict]:
-    with client.connect(f"ws://localhost:{port}/session") as websocket:
-        with Session(websocket) as session:
-            return session(method, params)
-    return None
+    Args:
+        port: The port number where the WebDriver BiDi server is running.
+        method: The BiDi method to call.
+        params: The parameters of the command.
+        on_result: Called on the connection's reader thread with the result,
+            if the command succeeds.
+    Returns:
+        True once the command has been queued.
+    """
+    return get_session(port).send_oneway(method, params, on_result)